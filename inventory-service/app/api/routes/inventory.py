@@ -533,14 +533,8 @@ async def check_and_notify_low_stock(inventory_item: InventoryItem):
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            # Publish to Redis channel
+            # Add to the persistent stream the notification service consumes
             from app.services.redis_client import redis_client
-            await redis_client.publish(
-                settings.NOTIFICATION_CHANNEL,
-                notification_data
-            )
-            
-            # Also add to persistent stream for reliability
             await redis_client.add_to_stream(
                 f"{settings.NOTIFICATION_CHANNEL}:stream",
                 notification_data
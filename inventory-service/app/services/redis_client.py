@@ -1,5 +1,5 @@
-import json
 import logging
+import orjson
 import redis.asyncio as redis
 from typing import Any, Dict
 
@@ -31,11 +31,17 @@ class RedisClient:
             logger.info("Closed Redis connection")
     
     async def publish(self, channel: str, message: Dict[str, Any]):
-        """Publish a message to a Redis channel."""
+        """
+        Publish a message to a Redis channel.
+        
+        Pub/sub delivery is fire-and-forget. Low stock notifications go
+        through the stream (add_to_stream) instead, so none are lost while
+        the notification service is down.
+        """
         await self.connect()
         
-        # Convert dict to JSON string
-        message_json = json.dumps(message)
+        # Serialize dict to JSON bytes
+        message_json = orjson.dumps(message)
         
         # Publish message
         await self.client.publish(channel, message_json)
@@ -0,0 +1,77 @@
+"""Add source_message_id, enum type/status columns and listing indexes
+
+Brings a notifications table created by an earlier version of the service
+up to date with the current model. Every step is idempotent, so it is also
+safe on a table already created with the current schema.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # On a fresh database the service creates the current schema itself
+    # at startup, so there is nothing to upgrade
+    if not context.is_offline_mode() and not sa.inspect(op.get_bind()).has_table("notifications"):
+        return
+
+    op.execute("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS source_message_id VARCHAR")
+
+    # Native enum types for the type and status columns
+    op.execute(
+        "DO $$ BEGIN "
+        "CREATE TYPE notification_type AS ENUM ('low_stock', 'test'); "
+        "EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+    )
+    op.execute(
+        "DO $$ BEGIN "
+        "CREATE TYPE notification_status AS ENUM ('pending', 'sent', 'failed'); "
+        "EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+    )
+    op.execute(
+        "ALTER TABLE notifications "
+        "ALTER COLUMN type TYPE notification_type USING type::text::notification_type"
+    )
+    op.execute(
+        "ALTER TABLE notifications "
+        "ALTER COLUMN status TYPE notification_status USING status::text::notification_status"
+    )
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. The unique
+    # index uses the name create_all gives the column's unique constraint,
+    # so it is skipped on tables that already have one
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS notifications_source_message_id_key "
+            "ON notifications (source_message_id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_status_created "
+            "ON notifications (status, created_at)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_type_created "
+            "ON notifications (type, created_at)"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_notifications_type_created")
+    op.execute("DROP INDEX IF EXISTS ix_notifications_status_created")
+    op.execute("ALTER TABLE notifications DROP COLUMN IF EXISTS source_message_id")
+
+    op.execute("ALTER TABLE notifications ALTER COLUMN status TYPE VARCHAR USING status::text")
+    op.execute("ALTER TABLE notifications ALTER COLUMN type TYPE VARCHAR USING type::text")
+    op.execute("DROP TYPE IF EXISTS notification_status")
+    op.execute("DROP TYPE IF EXISTS notification_type")
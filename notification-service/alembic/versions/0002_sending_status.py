@@ -0,0 +1,42 @@
+"""Add the sending notification status
+
+Notifications are moved from pending to sending when a processor claims
+them, so the same notification is never sent twice.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # On a fresh database the service creates the current schema itself
+    # at startup, so there is nothing to upgrade
+    if not context.is_offline_mode() and not sa.inspect(op.get_bind()).has_table("notifications"):
+        return
+
+    # A new enum value cannot be used in the transaction that adds it
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE notification_status ADD VALUE IF NOT EXISTS 'sending' AFTER 'pending'")
+
+
+def downgrade() -> None:
+    # PostgreSQL cannot drop an enum value, so rebuild the type without it
+    op.execute("UPDATE notifications SET status = 'pending' WHERE status = 'sending'")
+    op.execute("ALTER TYPE notification_status RENAME TO notification_status_old")
+    op.execute("CREATE TYPE notification_status AS ENUM ('pending', 'sent', 'failed')")
+    op.execute(
+        "ALTER TABLE notifications "
+        "ALTER COLUMN status TYPE notification_status USING status::text::notification_status"
+    )
+    op.execute("DROP TYPE notification_status_old")
@@ -0,0 +1,60 @@
+"""Index the notification listing's (created_at, id) keyset order
+
+Replaces the (status, created_at) and (type, created_at) indexes with ones
+that end in id, and adds one for the unfiltered listing, so every page of
+the newest-first listing is a single index range scan.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # On a fresh database the service creates the current schema itself
+    # at startup, so there is nothing to upgrade
+    if not context.is_offline_mode() and not sa.inspect(op.get_bind()).has_table("notifications"):
+        return
+
+    # Build the new indexes before dropping the old ones so the listing is
+    # never left without an index
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_created_id "
+            "ON notifications (created_at, id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_status_created_id "
+            "ON notifications (status, created_at, id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_type_created_id "
+            "ON notifications (type, created_at, id)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_status_created")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_type_created")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_status_created "
+            "ON notifications (status, created_at)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_type_created "
+            "ON notifications (type, created_at)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_created_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_status_created_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_type_created_id")
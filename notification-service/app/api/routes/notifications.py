@@ -1,14 +1,18 @@
 # notification-service/app/api/routes/notifications.py
 import logging
+from urllib.parse import urlencode
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, tuple_
 from sqlalchemy.future import select
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
-from app.models.notification import Notification, NotificationResponse
+from app.models.notification import Notification, NotificationResponse, NotificationStatus, NotificationType
 from app.db.postgresql import get_db
 from app.api.dependencies import get_current_user
+from app.services.notification_cache import get_cached_counts, set_cached_counts, invalidate_counts
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -17,20 +21,47 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 
-@router.get("/", response_model=List[NotificationResponse])
+@router.get(
+    "/",
+    response_class=ORJSONResponse,
+    responses={200: {"model": List[NotificationResponse]}}
+)
 async def get_notifications(
-    skip: int = Query(0, ge=0, description="Number of notifications to skip"),
     limit: int = Query(20, ge=1, le=100, description="Max number of notifications to return"),
-    status: Optional[str] = Query(None, description="Filter by status"),
-    type: Optional[str] = Query(None, description="Filter by notification type"),
+    before_created_at: Optional[datetime] = Query(None, description="Cursor: creation time of the last notification on the previous page"),
+    before_id: Optional[int] = Query(None, description="Cursor: ID of the last notification on the previous page"),
+    status: Optional[NotificationStatus] = Query(None, description="Filter by status"),
+    type: Optional[NotificationType] = Query(None, description="Filter by notification type"),
     db: AsyncSession = Depends(get_db),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
-    Get all notifications with optional filtering.
+    Get all notifications with optional filtering, newest first.
+    
+    Pages are fetched with a keyset cursor: pass the values from the
+    X-Next-Cursor response header to get the next page.
     """
-    # Build query
-    query = select(Notification)
+    if (before_created_at is None) != (before_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail="before_created_at and before_id must be provided together"
+        )
+    
+    # Build query over just the response columns, skipping ORM instances
+    query = select(
+        Notification.id,
+        Notification.type,
+        Notification.channel,
+        Notification.recipient_id,
+        Notification.subject,
+        Notification.content,
+        Notification.data,
+        Notification.status,
+        Notification.error_message,
+        Notification.created_at,
+        Notification.updated_at,
+        Notification.sent_at,
+    )
     
     if status:
         query = query.where(Notification.status == status)
@@ -38,14 +69,71 @@ async def get_notifications(
     if type:
         query = query.where(Notification.type == type)
     
+    # Seek past the previous page instead of scanning and skipping rows
+    if before_created_at is not None:
+        query = query.where(
+            tuple_(Notification.created_at, Notification.id) < (before_created_at, before_id)
+        )
+    
     # Add ordering and pagination
-    query = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit)
+    query = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit)
     
     # Execute query
     result = await db.execute(query)
-    notifications = result.scalars().all()
+    notifications = [dict(row) for row in result.mappings()]
     
-    return notifications
+    # Point to the next page when this one is full
+    headers = {}
+    if len(notifications) == limit:
+        last = notifications[-1]
+        headers["X-Next-Cursor"] = urlencode({
+            "before_created_at": last["created_at"].isoformat(),
+            "before_id": last["id"]
+        })
+    
+    # Return the response directly so the rows are serialized once by orjson
+    return ORJSONResponse(notifications, headers=headers)
+
+
+@router.get("/count", response_model=Dict[str, int])
+async def get_notification_count(
+    type: Optional[NotificationType] = Query(None, description="Filter by notification type"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get notification counts, broken down by delivery status.
+    """
+    # Serve from the short-lived Redis cache when possible
+    cached = await get_cached_counts(type)
+    if cached is not None:
+        return cached
+    
+    # Let PostgreSQL do the counting in a single aggregate query
+    query = select(
+        func.count(Notification.id),
+        func.count(Notification.id).filter(
+            Notification.status.in_([NotificationStatus.PENDING, NotificationStatus.SENDING])
+        ),
+        func.count(Notification.id).filter(Notification.status == NotificationStatus.SENT),
+        func.count(Notification.id).filter(Notification.status == NotificationStatus.FAILED),
+    )
+    
+    if type:
+        query = query.where(Notification.type == type)
+    
+    result = await db.execute(query)
+    total, pending, sent, failed = result.one()
+    
+    counts = {
+        "total": total,
+        "pending": pending,
+        "sent": sent,
+        "failed": failed
+    }
+    await set_cached_counts(counts, type)
+    
+    return counts
 
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
@@ -88,18 +176,20 @@ async def send_test_notification(
     
     # Create a test notification with the required fields
     test_notification = Notification(
-        type="test",
+        type=NotificationType.TEST,
         channel="email",  # Add this required field
         recipient_id="admin",  # Add this field
         subject="Test Notification",
         content="This is a test notification to verify email delivery.",
-        status="pending",
+        status=NotificationStatus.SENDING,  # sent right here, not by the processor
         data={"test": True}
     )
     
     db.add(test_notification)
     await db.commit()
-    await db.refresh(test_notification)
+    
+    # The primary key is populated by the INSERT, no refresh needed
+    await invalidate_counts(test_notification.type)
     
     # Send test email
     success = await email_provider.send_email(
@@ -109,14 +199,15 @@ async def send_test_notification(
     )
     
     if success:
-        test_notification.status = "sent"
-        test_notification.sent_at = datetime.utcnow()
+        test_notification.status = NotificationStatus.SENT
+        test_notification.sent_at = func.now()
     else:
-        test_notification.status = "failed"
+        test_notification.status = NotificationStatus.FAILED
         test_notification.error_message = "Failed to send email"
     
-    test_notification.updated_at = datetime.utcnow()
+    # updated_at is set by the database through the column's onupdate
     await db.commit()
+    await invalidate_counts(test_notification.type)
     
     return {
         "message": "Test notification created", 
@@ -13,10 +13,25 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: PostgresDsn
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds
+    DB_POOL_RECYCLE: int = 1800  # seconds
     
     # Redis settings for notifications
     REDIS_URL: RedisDsn = "redis://redis:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 64
+    REDIS_ACK_BATCH_SIZE: int = 128  # max stream acks sent per flush
+    REDIS_ACK_FLUSH_INTERVAL_MS: int = 5  # max wait to fill an ack batch
     NOTIFICATION_CHANNEL: str = "inventory:low-stock"
+    NOTIFICATION_STREAM: str = "inventory:low-stock:stream"
+    NOTIFICATION_CONSUMER_GROUP: str = "notification-service"
+    NOTIFICATION_CONSUMER_NAME: str  # required: unique per replica, stable across restarts
+    NOTIFICATION_STREAM_BLOCK_MS: int = 5000
+    NOTIFICATION_STREAM_READ_COUNT: int = 256  # max messages per XREADGROUP
+    NOTIFICATION_CLAIM_INTERVAL: int = 30  # seconds between pending message reclaims
+    NOTIFICATION_CLAIM_MIN_IDLE_MS: int = 60000  # pending time before a message is reclaimed
+    NOTIFICATION_COUNT_CACHE_TTL: int = 30  # seconds
     
     # Email settings
     SMTP_HOST: str = "sandbox.smtp.mailtrap.io"
@@ -25,12 +40,16 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: Optional[str] = None
     EMAIL_FROM: Optional[EmailStr] = None
     EMAIL_FROM_NAME: str = "E-commerce Notifications"
+    EMAIL_CONCURRENCY: int = 8  # max parallel SMTP sends/connections
     
     # Admin email for receiving low stock notifications
     ADMIN_EMAIL: Optional[EmailStr] = "admin@example.com"
     
     # Notification processing settings
-    NOTIFICATION_PROCESSING_INTERVAL: int = 30  # seconds
+    NOTIFICATION_PROCESSING_INTERVAL: int = 30  # seconds between unfinished send recoveries
+    NOTIFICATION_SEND_TIMEOUT: int = 600  # seconds before an unfinished send is retried
+    NOTIFICATION_BATCH_SIZE: int = 50  # max notifications stored per INSERT
+    NOTIFICATION_FLUSH_INTERVAL_MS: int = 50  # max wait to fill a batch
     
     class Config:
         env_file = ".env"
@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import notifications
 from app.core.config import settings
 from app.db.postgresql import initialize_db, close_db_connection
-from app.services.redis_client import redis_client
+from app.services.redis_client import get_redis_client
 from app.services.notification_processor import notification_processor
 
 app = FastAPI(
@@ -23,25 +23,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Pagination cursor for browser clients
 )
 
 # Set up API routes
 app.include_router(notifications.router, prefix=settings.API_PREFIX)
 
-# Register startup and shutdown events
+# Register startup events
 app.add_event_handler("startup", initialize_db)
-app.add_event_handler("shutdown", close_db_connection)
 
 # Add Redis connection handling
 @app.on_event("startup")
 async def connect_to_redis():
     """Connect to Redis."""
-    await redis_client.connect()
-
-@app.on_event("shutdown")
-async def close_redis_connection():
-    """Close Redis connection."""
-    await redis_client.close()
+    await get_redis_client().connect()
 
 # Start notification processor
 @app.on_event("startup")
@@ -49,10 +44,15 @@ async def start_notification_processor():
     """Start the notification processor."""
     await notification_processor.start()
 
+# Shut down in reverse order of startup: stopping the processor still
+# stores, acknowledges and updates notifications, so Redis and the
+# database must stay open until it has finished
 @app.on_event("shutdown")
-async def stop_notification_processor():
-    """Stop the notification processor."""
+async def shutdown():
+    """Stop the notification processor, then close Redis and the database."""
     await notification_processor.stop()
+    await get_redis_client().close()
+    await close_db_connection()
 
 # Health check endpoint
 @app.get("/health")
@@ -61,4 +61,4 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=settings.PORT, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=settings.PORT, reload=True, loop="uvloop")
\ No newline at end of file
@@ -1,5 +1,6 @@
 # notification-service/app/models/notification.py
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index, Enum
 from sqlalchemy.sql import func
 from datetime import datetime
 from pydantic import BaseModel, Field
@@ -8,13 +9,35 @@ from typing import Optional, Dict, Any
 from app.db.postgresql import Base
 
 
+class NotificationType(str, enum.Enum):
+    """Kinds of notification the service produces."""
+    LOW_STOCK = "low_stock"
+    TEST = "test"
+
+
+class NotificationStatus(str, enum.Enum):
+    """Delivery status of a notification."""
+    PENDING = "pending"  # stored, not yet picked up for sending
+    SENDING = "sending"  # claimed by a processor that is sending it
+    SENT = "sent"
+    FAILED = "failed"
+
+
+def _enum_values(enum_class):
+    """Store enum values (not member names) in the database enum type."""
+    return [member.value for member in enum_class]
+
+
 # SQLAlchemy Models
 class Notification(Base):
     """Database model for notifications."""
     __tablename__ = "notifications"
     
     id = Column(Integer, primary_key=True, index=True)
-    type = Column(String, nullable=False)  # "low_stock", etc.
+    type = Column(
+        Enum(NotificationType, name="notification_type", values_callable=_enum_values),
+        nullable=False
+    )
     channel = Column(String, nullable=False, default="email")  # Add this field
     
     # Recipients
@@ -25,22 +48,38 @@ class Notification(Base):
     content = Column(Text, nullable=False)
     
     # Delivery status
-    status = Column(String, nullable=False, default="pending")  # "pending", "sent", "failed"
+    status = Column(
+        Enum(NotificationStatus, name="notification_status", values_callable=_enum_values),
+        nullable=False,
+        default=NotificationStatus.PENDING
+    )
     error_message = Column(String, nullable=True)
     
     # Data used to generate the notification
     data = Column(JSON, nullable=True)
     
+    # ID of the Redis stream message this notification was created from,
+    # unique so a redelivered message is never stored twice
+    source_message_id = Column(String, nullable=True, unique=True)
+    
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Composite indexes matching the listing's (created_at, id) keyset
+    # order, unfiltered and with the status/type filters
+    __table_args__ = (
+        Index("ix_notifications_created_id", "created_at", "id"),
+        Index("ix_notifications_status_created_id", "status", "created_at", "id"),
+        Index("ix_notifications_type_created_id", "type", "created_at", "id"),
+    )
 
 
 # Pydantic Models for API
 class NotificationBase(BaseModel):
     """Base model for notifications."""
-    type: str
+    type: NotificationType
     channel: str = "email"  # Add this field
     recipient_id: Optional[str] = None  # Add this field
     subject: Optional[str] = None
@@ -56,7 +95,7 @@ class NotificationCreate(NotificationBase):
 class NotificationResponse(NotificationBase):
     """Model for notification response."""
     id: int
-    status: str
+    status: NotificationStatus
     error_message: Optional[str] = None
     created_at: datetime
     updated_at: datetime
@@ -1,5 +1,7 @@
 # notification-service/app/services/email_provider.py
+import asyncio
 import logging
+import re
 import aiosmtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -9,6 +11,9 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Paragraph and line break tags replaced with newlines in the plain text version
+_TAG_TO_NL = re.compile(r"</?(?:p|br)\b[^>]*>", re.IGNORECASE)
+
 class EmailProvider:
     """Provider for sending email notifications."""
     
@@ -20,9 +25,111 @@ class EmailProvider:
         self.from_email = settings.EMAIL_FROM
         self.from_name = settings.EMAIL_FROM_NAME
         
+        # Pool of persistent SMTP connections, one per concurrent send
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(settings.EMAIL_CONCURRENCY)
+        
         # Log the configuration at initialization
         logger.info(f"Email provider initialized with: Host={self.host}, Port={self.port}, User={self.username}")
     
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        """
+        Take an idle connected SMTP client from the pool, or open a new one.
+        """
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:
+                return smtp
+        
+        return await self._connect()
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        """
+        Open a new connected and authenticated SMTP client.
+        """
+        logger.info(f"Connecting to SMTP server {self.host}:{self.port}")
+        
+        # For Mailtrap sandbox, we need different settings based on port
+        if self.port == 2525:
+            # Port 2525 - Plain authentication, no TLS
+            smtp = aiosmtplib.SMTP(
+                hostname=self.host,
+                port=self.port,
+                use_tls=False,
+                start_tls=False
+            )
+            logger.info("Using plain authentication for port 2525")
+            
+            # Connect
+            await smtp.connect()
+            logger.info("Connected to SMTP server")
+            
+        elif self.port == 587:
+            # Port 587 - STARTTLS
+            smtp = aiosmtplib.SMTP(
+                hostname=self.host,
+                port=self.port,
+                use_tls=False,
+                start_tls=True
+            )
+            logger.info("Using STARTTLS for port 587")
+            
+            # Connect
+            await smtp.connect()
+            logger.info("Connected to SMTP server")
+            
+            # Start TLS
+            await smtp.starttls()
+            logger.info("TLS started")
+            
+        elif self.port == 465:
+            # Port 465 - SSL/TLS
+            smtp = aiosmtplib.SMTP(
+                hostname=self.host,
+                port=self.port,
+                use_tls=True,
+                start_tls=False
+            )
+            logger.info("Using SSL/TLS for port 465")
+            
+            # Connect
+            await smtp.connect()
+            logger.info("Connected to SMTP server")
+            
+        else:
+            # Default fallback
+            smtp = aiosmtplib.SMTP(
+                hostname=self.host,
+                port=self.port,
+            )
+            logger.info("Using default configuration")
+            
+            # Connect
+            await smtp.connect()
+            logger.info("Connected to SMTP server")
+        
+        # Login, closing the connection if it fails so the socket is not leaked
+        try:
+            await smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        logger.info("Logged in successfully")
+        
+        return smtp
+    
+    async def close(self):
+        """Close all pooled SMTP connections."""
+        while self._idle:
+            smtp = self._idle.pop()
+            if not smtp.is_connected:
+                continue
+            try:
+                await smtp.quit()
+                logger.info("SMTP connection closed")
+            except aiosmtplib.SMTPException as e:
+                logger.warning(f"Error closing SMTP connection: {str(e)}")
+    
     async def send_email(
         self, 
         to_email: str, 
@@ -59,7 +166,7 @@ class EmailProvider:
                 message.attach(MIMEText(text_content, "plain", "utf-8"))
             else:
                 # Generate plain text from HTML
-                text_version = html_content.replace("<br>", "\n").replace("<br/>", "\n").replace("<p>", "\n").replace("</p>", "\n")
+                text_version = _TAG_TO_NL.sub("\n", html_content)
                 message.attach(MIMEText(text_version, "plain", "utf-8"))
             
             # Add HTML version
@@ -72,99 +179,30 @@ class EmailProvider:
             if bcc:
                 recipients.extend(bcc)
             
-            logger.info(f"Connecting to SMTP server {self.host}:{self.port}")
-            
-            # Send email with Mailtrap-specific configuration
-            try:
-                # For Mailtrap sandbox, we need different settings based on port
-                if self.port == 2525:
-                    # Port 2525 - Plain authentication, no TLS
-                    smtp = aiosmtplib.SMTP(
-                        hostname=self.host,
-                        port=self.port,
-                        use_tls=False,
-                        start_tls=False
-                    )
-                    logger.info("Using plain authentication for port 2525")
-                    
-                    # Connect
-                    await smtp.connect()
-                    logger.info("Connected to SMTP server")
-                    
-                    # Login directly without TLS
-                    await smtp.login(self.username, self.password)
-                    logger.info("Logged in successfully")
-                    
-                elif self.port == 587:
-                    # Port 587 - STARTTLS
-                    smtp = aiosmtplib.SMTP(
-                        hostname=self.host,
-                        port=self.port,
-                        use_tls=False,
-                        start_tls=True
-                    )
-                    logger.info("Using STARTTLS for port 587")
-                    
-                    # Connect
-                    await smtp.connect()
-                    logger.info("Connected to SMTP server")
-                    
-                    # Start TLS
-                    await smtp.starttls()
-                    logger.info("TLS started")
+            # Send over a pooled connection, reconnecting once if the
+            # server has dropped it since the last message
+            async with self._slots:
+                smtp = None
+                try:
+                    smtp = await self._acquire()
+                    try:
+                        await smtp.send_message(message, recipients=recipients)
+                    except aiosmtplib.SMTPServerDisconnected:
+                        logger.warning("SMTP connection lost, reconnecting")
+                        smtp = await self._connect()
+                        await smtp.send_message(message, recipients=recipients)
                     
-                    # Login
-                    await smtp.login(self.username, self.password)
-                    logger.info("Logged in successfully")
+                    # Return the connection to the pool for the next send
+                    self._idle.append(smtp)
                     
-                elif self.port == 465:
-                    # Port 465 - SSL/TLS
-                    smtp = aiosmtplib.SMTP(
-                        hostname=self.host,
-                        port=self.port,
-                        use_tls=True,
-                        start_tls=False
-                    )
-                    logger.info("Using SSL/TLS for port 465")
+                    logger.info(f"Email successfully sent to {to_email}")
+                    return True
                     
-                    # Connect
-                    await smtp.connect()
-                    logger.info("Connected to SMTP server")
-                    
-                    # Login
-                    await smtp.login(self.username, self.password)
-                    logger.info("Logged in successfully")
-                    
-                else:
-                    # Default fallback
-                    smtp = aiosmtplib.SMTP(
-                        hostname=self.host,
-                        port=self.port,
-                    )
-                    logger.info("Using default configuration")
-                    
-                    # Connect
-                    await smtp.connect()
-                    logger.info("Connected to SMTP server")
-                    
-                    # Login
-                    await smtp.login(self.username, self.password)
-                    logger.info("Logged in successfully")
-                
-                # Send the message
-                await smtp.send_message(message)
-                logger.info("Message sent successfully")
-                
-                # Quit
-                await smtp.quit()
-                logger.info("SMTP connection closed")
-                
-                logger.info(f"Email successfully sent to {to_email}")
-                return True
-                
-            except Exception as e:
-                logger.error(f"SMTP operation error: {str(e)}")
-                raise
+                except Exception as e:
+                    logger.error(f"SMTP operation error: {str(e)}")
+                    if smtp is not None:
+                        smtp.close()
+                    raise
             
         except Exception as e:
             logger.error(f"Failed to send email to {to_email}: {str(e)}")
@@ -0,0 +1,59 @@
+# notification-service/app/services/notification_cache.py
+import logging
+from typing import Dict, Optional
+
+import orjson
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.models.notification import NotificationType
+from app.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def count_cache_key(notification_type: Optional[NotificationType] = None) -> str:
+    """Redis key holding the cached counts for a notification type (or all)."""
+    if notification_type is None:
+        return "notification:count:all"
+    return f"notification:count:{NotificationType(notification_type).value}"
+
+
+async def get_cached_counts(notification_type: Optional[NotificationType] = None) -> Optional[Dict[str, int]]:
+    """
+    Get cached notification counts, or None on a cache miss.
+    """
+    try:
+        cached = await get_redis_client().client.get(count_cache_key(notification_type))
+    except RedisError as e:
+        logger.warning(f"Failed to read notification counts from cache: {str(e)}")
+        return None
+
+    return orjson.loads(cached) if cached else None
+
+
+async def set_cached_counts(counts: Dict[str, int], notification_type: Optional[NotificationType] = None):
+    """
+    Cache notification counts for a short time.
+    """
+    try:
+        await get_redis_client().client.setex(
+            count_cache_key(notification_type),
+            settings.NOTIFICATION_COUNT_CACHE_TTL,
+            orjson.dumps(counts)
+        )
+    except RedisError as e:
+        logger.warning(f"Failed to cache notification counts: {str(e)}")
+
+
+async def invalidate_counts(notification_type: NotificationType):
+    """
+    Drop the cached counts affected by a change to a notification of the given type.
+    """
+    try:
+        await get_redis_client().client.delete(
+            count_cache_key(),
+            count_cache_key(notification_type)
+        )
+    except RedisError as e:
+        logger.warning(f"Failed to invalidate notification counts: {str(e)}")
@@ -2,14 +2,20 @@
 import json
 import logging
 import asyncio
-from datetime import datetime
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.db.postgresql import AsyncSessionLocal
-from app.models.notification import Notification
-from app.services.redis_client import redis_client
+from app.models.notification import Notification, NotificationStatus, NotificationType
+from app.services.redis_client import get_redis_client
 from app.services.email_provider import email_provider
+from app.services.template_renderer import template_renderer
+from app.services.notification_cache import invalidate_counts
 
 logger = logging.getLogger(__name__)
 
@@ -17,45 +23,147 @@ class NotificationProcessor:
     """Simplified processor for handling admin notifications."""
     
     def __init__(self):
-        self.running = False
+        # Set by stop() to wake and end the background loops immediately
+        self._stop_event = asyncio.Event()
+        self._listener_task = None
+        self._recovery_task = None
+        
+        # Redis stream consumer group this processor reads from
+        self.stream = settings.NOTIFICATION_STREAM
+        self.group = settings.NOTIFICATION_CONSUMER_GROUP
+        self.consumer = settings.NOTIFICATION_CONSUMER_NAME
+        
+        # Incoming notifications waiting to be stored by the batch writer
+        self._queue = asyncio.Queue(maxsize=settings.NOTIFICATION_BATCH_SIZE * 10)
+        self._writer_task = None
+        
+        # Notifications being sent; the email provider's connection slots
+        # bound how many of them talk to the SMTP server at once
+        self._tasks = set()
+        self._sending_ids = set()
     
     async def start(self):
         """Start the notification processor."""
-        self.running = True
+        self._stop_event.clear()
+        
+        # Start the batch writer before any notifications can arrive
+        self._writer_task = asyncio.create_task(self.store_notifications())
+        
+        # Start consuming notifications from the Redis stream
+        self._listener_task = asyncio.create_task(self.listen_for_notifications())
         
-        # Start the Redis subscription for real-time notifications
-        asyncio.create_task(self.listen_for_notifications())
+        # Retry sends that never finished, e.g. because a process crashed
+        self._recovery_task = asyncio.create_task(self.recover_notifications())
         
         logger.info("Notification processor started")
     
     async def stop(self):
         """Stop the notification processor."""
-        self.running = False
-        await redis_client.stop()
+        self._stop_event.set()
+        
+        # Stop reading without waiting out a blocking XREADGROUP; anything
+        # read but not yet stored stays pending in the consumer group and
+        # is picked up again on the next start
+        for task in (self._listener_task, self._recovery_task):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        
+        # Store whatever is still queued, then stop the batch writer
+        await self._queue.join()
+        if self._writer_task:
+            self._writer_task.cancel()
+        
+        # Let in-flight notifications finish before closing SMTP connections
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        
+        await email_provider.close()
         logger.info("Notification processor stopped")
     
     async def listen_for_notifications(self):
-        """Listen for notifications from Redis pub/sub."""
-        channel = settings.NOTIFICATION_CHANNEL
-        await redis_client.subscribe(channel, self.handle_notification)
+        """Consume notifications from the Redis stream as a consumer group member."""
+        redis_client = get_redis_client()
+        await redis_client.create_consumer_group(self.stream, self.group)
+        logger.info(f"Consuming stream {self.stream} as {self.consumer} in group {self.group}")
+        
+        # First re-read messages delivered to this consumer but never
+        # acknowledged (e.g. before a restart), then switch to new messages
+        last_id = "0"
+        
+        # Messages that stay pending too long (their batch failed to store,
+        # or the consumer they were delivered to is gone) are reclaimed
+        # periodically, resuming the scan of the pending list each time
+        loop = asyncio.get_running_loop()
+        next_claim = loop.time() + settings.NOTIFICATION_CLAIM_INTERVAL
+        claim_id = "0-0"
+        
+        while not self._stop_event.is_set():
+            try:
+                if loop.time() >= next_claim:
+                    claim_id, claimed = await redis_client.claim_pending(
+                        self.stream,
+                        self.group,
+                        self.consumer,
+                        settings.NOTIFICATION_CLAIM_MIN_IDLE_MS,
+                        start_id=claim_id,
+                        count=settings.NOTIFICATION_STREAM_READ_COUNT
+                    )
+                    next_claim = loop.time() + settings.NOTIFICATION_CLAIM_INTERVAL
+                    
+                    if claimed:
+                        logger.info(f"Reclaimed {len(claimed)} pending notifications")
+                    for message_id, data in claimed:
+                        await self.handle_notification(message_id, data)
+                
+                messages = await redis_client.read_group(
+                    self.stream,
+                    self.group,
+                    self.consumer,
+                    last_id=last_id,
+                    count=settings.NOTIFICATION_STREAM_READ_COUNT,
+                    block_ms=settings.NOTIFICATION_STREAM_BLOCK_MS
+                )
+                
+                if last_id != ">":
+                    last_id = messages[-1][0] if messages else ">"
+                
+                for message_id, data in messages:
+                    await self.handle_notification(message_id, data)
+            
+            except RedisError as e:
+                logger.error(f"Error consuming notification stream: {str(e)}")
+                
+                # Back off before retrying, unless asked to stop meanwhile
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
     
-    async def handle_notification(self, data: dict):
+    async def handle_notification(self, message_id: str, data: dict):
         """Handle a notification received from Redis."""
         logger.info(f"Received notification: {data}")
         
-        try:
-            notification_type = data.get("type")
-            
-            if notification_type == "low_stock":
-                await self.handle_low_stock_notification(data)
-            else:
-                logger.warning(f"Unknown notification type: {notification_type}")
+        notification_type = data.get("type")
+        notification = None
         
-        except Exception as e:
-            logger.error(f"Error handling notification: {str(e)}")
+        if notification_type == NotificationType.LOW_STOCK:
+            notification = self.build_low_stock_notification(data)
+        else:
+            logger.warning(f"Unknown notification type: {notification_type}")
+        
+        if notification is None:
+            # Nothing to store, so there is no point in seeing it again
+            await get_redis_client().acknowledge_message(self.stream, self.group, message_id)
+            return
+        
+        notification["source_message_id"] = message_id
+        
+        # Hand off to the batch writer; waits here if it falls behind
+        await self._queue.put(notification)
     
-    async def handle_low_stock_notification(self, data: dict):
-        """Handle a low stock notification and send to admin email."""
+    def build_low_stock_notification(self, data: dict) -> Optional[Dict[str, Any]]:
+        """Build the database row for a low stock notification."""
         product_id = data.get("product_id")
         product_name = data.get("product_name", product_id)
         current_quantity = data.get("current_quantity")
@@ -63,45 +171,183 @@ class NotificationProcessor:
         
         if not product_id or current_quantity is None or threshold is None:
             logger.error(f"Invalid low stock notification data: {data}")
-            return
+            return None
+        
+        return {
+            "type": NotificationType.LOW_STOCK,
+            "channel": "email",
+            "recipient_id": "admin",
+            "subject": f"Low Stock Alert: {product_name}",
+            "content": f"Product '{product_name}' is running low on stock. Current quantity: {current_quantity}, Threshold: {threshold}",
+            "data": data,
+            "status": NotificationStatus.PENDING
+        }
+    
+    async def store_notifications(self):
+        """Store queued notifications in batches and dispatch their emails."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            # Wait for the first notification, then give the batch a short
+            # window to fill up so a burst shares a single INSERT and commit
+            batch = [await self._queue.get()]
+            deadline = loop.time() + settings.NOTIFICATION_FLUSH_INTERVAL_MS / 1000
+            
+            while len(batch) < settings.NOTIFICATION_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self.save_notifications(batch)
+            except Exception as e:
+                logger.error(f"Error storing notifications: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def save_notifications(self, rows: List[Dict[str, Any]]):
+        """
+        Insert a batch of notifications, then send each in the background.
+        
+        A redelivered message that was already stored is not inserted again.
+        Only notifications this call moves from pending to sending are sent,
+        so one already being sent, here or by another replica, or already
+        sent or failed, never produces a second email.
+        """
+        message_ids = [row["source_message_id"] for row in rows]
         
-        # Store notification in database for record keeping
         async with AsyncSessionLocal() as db:
-            db_notification = Notification(
-                type="low_stock",
-                channel="email",  # Add required field
-                recipient_id="admin",  # Add required field
-                subject=f"Low Stock Alert: {product_name}",
-                content=f"Product '{product_name}' is running low on stock. Current quantity: {current_quantity}, Threshold: {threshold}",
-                data=data,
-                status="pending"
+            # Store notifications in database for record keeping; the unique
+            # source_message_id skips messages that were stored before
+            result = await db.scalars(
+                pg_insert(Notification)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["source_message_id"])
+                .returning(Notification.type)
             )
-            db.add(db_notification)
+            inserted_types = set(result.all())
+            
+            # Atomically claim the batch's notifications nobody has started
+            # sending; concurrent claims of the same row wait on its lock
+            # and then no longer match the pending status
+            result = await db.scalars(
+                update(Notification)
+                .where(
+                    Notification.source_message_id.in_(message_ids),
+                    Notification.status == NotificationStatus.PENDING
+                )
+                .values(status=NotificationStatus.SENDING)
+                .returning(Notification)
+            )
+            notifications = result.all()
             await db.commit()
-            await db.refresh(db_notification)
+        
+        # Only acknowledge stream messages once they are safely stored
+        await get_redis_client().acknowledge_messages(self.stream, self.group, message_ids)
+        
+        for notification_type in inserted_types:
+            await invalidate_counts(notification_type)
+        
+        self.dispatch_notifications(notifications)
+    
+    async def recover_notifications(self):
+        """Periodically claim and resend notifications whose send never finished."""
+        while not self._stop_event.is_set():
+            try:
+                notifications = await self.claim_unfinished_notifications()
+                if notifications:
+                    logger.info(f"Retrying {len(notifications)} unfinished notifications")
+                    self.dispatch_notifications(notifications)
+            except Exception as e:
+                logger.error(f"Error recovering unfinished notifications: {str(e)}")
             
-            notification_id = db_notification.id
+            try:
+                await asyncio.wait_for(
+                    self._stop_event.wait(),
+                    timeout=settings.NOTIFICATION_PROCESSING_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+    
+    async def claim_unfinished_notifications(self) -> Sequence[Notification]:
+        """
+        Claim notifications left pending or sending for too long.
+        
+        Stream messages are acknowledged once their notification is stored,
+        so a send cut short by a crash is only retried from here. The claim
+        restarts the send timeout, and SKIP LOCKED lets several replicas
+        sweep at once without claiming the same rows.
+        """
+        stale = (
+            select(Notification.id)
+            .where(
+                Notification.type == NotificationType.LOW_STOCK,
+                Notification.status.in_([NotificationStatus.PENDING, NotificationStatus.SENDING]),
+                Notification.updated_at < func.now() - timedelta(seconds=settings.NOTIFICATION_SEND_TIMEOUT)
+            )
+            .order_by(Notification.updated_at)
+            .limit(settings.NOTIFICATION_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        
+        # Sends still running in this process are slow, not lost
+        if self._sending_ids:
+            stale = stale.where(Notification.id.not_in(self._sending_ids))
+        
+        async with AsyncSessionLocal() as db:
+            result = await db.scalars(
+                update(Notification)
+                .where(Notification.id.in_(stale.scalar_subquery()))
+                .values(status=NotificationStatus.SENDING)
+                .returning(Notification)
+            )
+            notifications = result.all()
+            await db.commit()
+        
+        return notifications
+    
+    def dispatch_notifications(self, notifications: Sequence[Notification]):
+        """Send claimed notifications in the background."""
+        # Never wait for a free send slot here, so slow SMTP does not hold
+        # up storing the next batch
+        for notification in notifications:
+            self._sending_ids.add(notification.id)
+            task = asyncio.create_task(self.send_notification(notification))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def send_notification(self, notification: Notification):
+        """Send a stored notification according to its type."""
+        try:
+            if notification.type == NotificationType.LOW_STOCK:
+                await self.send_low_stock_notification(notification)
+        
+        except Exception as e:
+            logger.error(f"Error handling notification: {str(e)}")
+        finally:
+            self._sending_ids.discard(notification.id)
+    
+    async def send_low_stock_notification(self, notification: Notification):
+        """Send a stored low stock notification to the admin email."""
+        data = notification.data
+        product_id = data.get("product_id")
+        product_name = data.get("product_name", product_id)
         
         # Send email to admin
         if settings.ADMIN_EMAIL:
             # Prepare email content
-            html_content = f"""
-            <h2>🚨 Low Stock Alert</h2>
-            <p>Product <strong>{product_name}</strong> is running low on stock and needs immediate attention.</p>
-            
-            <div style="background-color: #f8f9fa; padding: 15px; border-left: 4px solid #dc3545; margin: 15px 0;">
-                <h3>Stock Details:</h3>
-                <ul style="margin: 0; padding-left: 20px;">
-                    <li><strong>Product ID:</strong> {product_id}</li>
-                    <li><strong>Product Name:</strong> {product_name}</li>
-                    <li><strong>Current Quantity:</strong> <span style="color: #dc3545; font-weight: bold;">{current_quantity}</span></li>
-                    <li><strong>Reorder Threshold:</strong> {threshold}</li>
-                    <li><strong>Stock Status:</strong> <span style="color: #dc3545;">Below Threshold</span></li>
-                </ul>
-            </div>
-
-            <p><strong>Action Required:</strong> Please replenish the inventory as soon as possible to avoid stockouts.</p>
-            """
+            html_content = template_renderer.render(
+                "low_stock.html",
+                product_id=product_id,
+                product_name=product_name,
+                current_quantity=data.get("current_quantity"),
+                threshold=data.get("threshold")
+            )
             
             # Send email
             success = await email_provider.send_email(
@@ -111,22 +357,29 @@ class NotificationProcessor:
             )
             
             # Update notification status
-            async with AsyncSessionLocal() as db:
-                notification = await db.get(Notification, notification_id)
-                if success:
-                    notification.status = "sent"
-                    notification.sent_at = datetime.utcnow()
-                    logger.info(f"Sent low stock email notification to admin for product {product_id}")
-                else:
-                    notification.status = "failed"
-                    notification.error_message = "Failed to send email"
-                    logger.error(f"Failed to send low stock email notification to admin for product {product_id}")
-                
-                notification.updated_at = datetime.utcnow()
-                await db.commit()
+            if success:
+                values = {"status": NotificationStatus.SENT, "sent_at": func.now()}
+                logger.info(f"Sent low stock email notification to admin for product {product_id}")
+            else:
+                values = {"status": NotificationStatus.FAILED, "error_message": "Failed to send email"}
+                logger.error(f"Failed to send low stock email notification to admin for product {product_id}")
         else:
+            # Mark it failed so it is not retried as an unfinished send
+            values = {"status": NotificationStatus.FAILED, "error_message": "Admin email not configured"}
             logger.warning("Admin email not configured. Cannot send low stock notification email.")
         
+        # Issue a single UPDATE instead of loading the row first;
+        # updated_at is set by the database through the column's onupdate
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Notification)
+                .where(Notification.id == notification.id)
+                .values(**values)
+            )
+            await db.commit()
+        
+        await invalidate_counts(NotificationType.LOW_STOCK)
+        
         logger.info(f"Processed low stock notification for product {product_id}")
 
 # Create a singleton instance
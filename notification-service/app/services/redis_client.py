@@ -1,7 +1,17 @@
-import json
+"""
+Redis client for pub/sub, streams and caching.
+
+The subscribe and stream read loops wake on every message, so the service is
+meant to run on uvloop: the Dockerfile starts uvicorn with --loop uvloop.
+"""
+import asyncio
+import functools
 import logging
+import orjson
 import redis.asyncio as redis
-from typing import Any, Dict, Callable, Awaitable
+from redis.asyncio.connection import HiredisParser
+from redis.exceptions import ResponseError
+from typing import Any, Dict, Callable, Awaitable, List, Optional, Tuple
 
 from app.core.config import settings
 
@@ -10,58 +20,398 @@ logger = logging.getLogger(__name__)
 class RedisClient:
     """Client for interacting with Redis."""
     
-    def __init__(self, redis_url: str):
+    def __init__(
+        self,
+        redis_url: str,
+        max_connections: int = 64,
+        ack_batch_size: int = 128,
+        ack_flush_interval_ms: int = 5
+    ):
         self.redis_url = redis_url
-        self.client = None
-        self.pubsub = None
-        self._running = False
+        self.ack_batch_size = ack_batch_size
+        self.ack_flush_interval_ms = ack_flush_interval_ms
+        
+        # Build the pools and clients up front; connections are only opened
+        # on first use, so the command methods need no lazy-connect check
+        self._pool = self._create_pool(max_connections)
+        self.client = redis.Redis(connection_pool=self._pool)
+        
+        # Pub/Sub holds its connection for as long as it is subscribed, so
+        # give it a dedicated single-connection pool of its own; command
+        # traffic never competes with the subscriber for connections
+        self._pubsub_pool = self._create_pool(1)
+        self.pubsub = redis.Redis(connection_pool=self._pubsub_pool).pubsub()
+        
+        # Single acknowledgements queued for the background acker
+        self._ack_queue: Optional[asyncio.Queue] = None
+        self._ack_task: Optional[asyncio.Task] = None
+        self._ack_pipe = None
+    
+    def _create_pool(self, max_connections: int) -> redis.ConnectionPool:
+        """Create a connection pool for the configured Redis URL."""
+        # Parse replies with the hiredis C extension and keep them as bytes;
+        # orjson parses bytes directly, so payloads skip a UTF-8 decode
+        return redis.ConnectionPool.from_url(
+            self.redis_url,
+            max_connections=max_connections,
+            decode_responses=False,
+            parser_class=HiredisParser
+        )
     
     async def connect(self):
-        """Establish connection to Redis."""
-        if self.client is None:
-            try:
-                self.client = await redis.from_url(self.redis_url, decode_responses=True)
-                self.pubsub = self.client.pubsub()
-                logger.info("Connected to Redis")
-            except Exception as e:
-                logger.error(f"Failed to connect to Redis: {str(e)}")
-                raise
+        """Verify the connection to Redis and start the background acker."""
+        try:
+            await self.client.ping()
+            logger.info("Connected to Redis")
+        except Exception as e:
+            logger.error(f"Failed to connect to Redis: {str(e)}")
+            raise
+        
+        # The acker reuses one pipeline; execute() resets it after each flush
+        self._ack_pipe = self.client.pipeline(transaction=False)
+        self._ack_queue = asyncio.Queue()
+        self._ack_task = asyncio.create_task(self._ack_loop())
     
     async def close(self):
         """Close the Redis connection."""
-        if self.pubsub:
-            await self.pubsub.close()
+        # Flush acknowledgements still queued before dropping the connections
+        if self._ack_task:
+            await self._ack_queue.join()
+            self._ack_task.cancel()
+            await asyncio.gather(self._ack_task, return_exceptions=True)
+            self._ack_task = None
         
-        if self.client:
-            await self.client.close()
-            logger.info("Closed Redis connection")
+        await self.pubsub.close()
+        await self._pubsub_pool.disconnect()
+        await self.client.close()
+        await self._pool.disconnect()
+        logger.info("Closed Redis connection")
     
-    async def subscribe(self, channel: str, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+    async def subscribe(
+        self,
+        channel: str,
+        handler: Callable[..., Awaitable[None]],
+        max_concurrency: int = 10,
+        decoder: Optional[Callable[[bytes], Any]] = orjson.loads,
+        pass_raw: bool = False
+    ):
         """Subscribe to a Redis channel with a message handler."""
-        if not self.client:
-            await self.connect()
+        await self.subscribe_many(
+            {channel: handler},
+            max_concurrency=max_concurrency,
+            decoder=decoder,
+            pass_raw=pass_raw
+        )
+    
+    async def subscribe_many(
+        self,
+        handlers: Dict[str, Callable[..., Awaitable[None]]],
+        max_concurrency: int = 10,
+        decoder: Optional[Callable[[bytes], Any]] = orjson.loads,
+        pass_raw: bool = False
+    ):
+        """
+        Subscribe to several Redis channels, each with its own message handler.
         
-        await self.pubsub.subscribe(channel)
-        logger.info(f"Subscribed to channel: {channel}")
+        The notification processor reads the stream instead; this stays for
+        consumers that only need fire-and-forget pub/sub delivery.
         
-        self._running = True
-        while self._running:
-            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-            if message and message['type'] == 'message':
-                try:
-                    # Parse JSON data
-                    data = json.loads(message['data'])
-                    
-                    # Call the handler with the parsed data
-                    await handler(data)
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse message data: {message['data']}")
-                except Exception as e:
-                    logger.error(f"Error processing message: {str(e)}")
+        All channels share the one pub/sub connection and a single receive
+        loop that dispatches each message to its channel's handler. Each
+        message is handled in its own task, with at most max_concurrency
+        handlers running at once; when all are busy, reading waits for one
+        to finish, so a burst never queues up unbounded work.
+        
+        Payloads are parsed with decoder (JSON by default); pass decoder=None
+        to hand the raw bytes to the handler untouched. With pass_raw=True the
+        handler is called as handler(data, raw), so it can forward the
+        original bytes without serializing the parsed data again.
+        """
+        # Channel names arrive as bytes, so key the dispatch table by bytes
+        dispatch = {channel.encode(): handler for channel, handler in handlers.items()}
+        
+        await self.pubsub.subscribe(*handlers)
+        logger.info(f"Subscribed to channels: {', '.join(handlers)}")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        handler_tasks = set()
+        
+        try:
+            # listen() yields messages as the parser produces them and ends
+            # once stop() unsubscribes
+            async for message in self.pubsub.listen():
+                if message['type'] != 'message':
+                    continue
+                
+                handler = dispatch.get(message['channel'])
+                if handler is None:
+                    continue
+                
+                raw = data = message['data']
+                
+                if decoder is not None:
+                    try:
+                        data = decoder(raw)
+                    except ValueError:
+                        logger.error(f"Failed to parse message data: {raw}")
+                        continue
+                
+                args = (data, raw) if pass_raw else (data,)
+                
+                # Take a handler slot before creating the task, so no more
+                # than max_concurrency messages are ever held in memory
+                await semaphore.acquire()
+                
+                # Call the handler with the message data in the background
+                task = asyncio.create_task(handler(*args))
+                handler_tasks.add(task)
+                task.add_done_callback(handler_tasks.discard)
+                task.add_done_callback(lambda _: semaphore.release())
+                task.add_done_callback(self._log_handler_error)
+        finally:
+            # Let handlers already started finish
+            if handler_tasks:
+                await asyncio.gather(*handler_tasks, return_exceptions=True)
+    
+    @staticmethod
+    def _log_handler_error(task: asyncio.Task):
+        """Log the error a message handler task failed with, if any."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error processing message: {str(task.exception())}")
     
     async def stop(self):
         """Stop the subscription loop."""
-        self._running = False
+        if self.pubsub.subscribed:
+            await self.pubsub.unsubscribe()
+    
+    async def create_consumer_group(self, stream_name: str, group_name: str):
+        """Create a consumer group for a stream, creating the stream if needed."""
+        try:
+            # Start from new messages only, not the existing stream history
+            await self.client.xgroup_create(stream_name, group_name, id="$", mkstream=True)
+            logger.info(f"Created consumer group {group_name} for stream {stream_name}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def read_group(
+        self,
+        stream_name: str,
+        group_name: str,
+        consumer_name: str,
+        last_id: str = ">",
+        count: int = 256,
+        block_ms: int = 5000,
+        decode_fields: bool = True
+    ) -> List[Tuple[str, Dict[Any, Any]]]:
+        """
+        Read messages from a stream as a member of a consumer group.
+        
+        Returns up to count messages per call, waiting up to block_ms for at
+        least one. Use last_id ">" for new messages, or an ID to re-read this
+        consumer's pending (delivered but unacknowledged) messages after it.
+        With decode_fields=False field names and values are left as bytes.
+        """
+        response = await self.client.xreadgroup(
+            group_name,
+            consumer_name,
+            {stream_name: last_id},
+            count=count,
+            block=block_ms
+        )
+        if not response:
+            return []
+        
+        return self._decode_entries(response[0][1], decode_fields)
+    
+    async def claim_pending(
+        self,
+        stream_name: str,
+        group_name: str,
+        consumer_name: str,
+        min_idle_ms: int,
+        start_id: str = "0-0",
+        count: int = 100,
+        decode_fields: bool = True
+    ) -> Tuple[str, List[Tuple[str, Dict[Any, Any]]]]:
+        """
+        Claim messages left pending in a consumer group for at least min_idle_ms.
+        
+        Takes over messages delivered to any consumer in the group (including
+        this one) but not acknowledged in time, scanning the pending list from
+        start_id. Returns the ID to continue the scan from, which is "0-0" once
+        the whole list has been scanned, and the claimed messages.
+        """
+        response = await self.client.xautoclaim(
+            stream_name,
+            group_name,
+            consumer_name,
+            min_idle_ms,
+            start_id=start_id,
+            count=count
+        )
+        
+        # Entries deleted from the stream come back empty before Redis 7
+        entries = [entry for entry in response[1] if entry[0] is not None]
+        return response[0].decode(), self._decode_entries(entries, decode_fields)
+    
+    async def get_stream_messages(
+        self,
+        stream_name: str,
+        last_id: str = "0",
+        count: int = 10,
+        block_ms: Optional[int] = None,
+        decode_fields: bool = True
+    ) -> List[Tuple[str, Dict[Any, Any]]]:
+        """Read messages after last_id from a single stream."""
+        response = await self.client.xread({stream_name: last_id}, count=count, block=block_ms)
+        if not response:
+            return []
+        
+        # Only one stream was asked for, so its entries are the only ones
+        # returned; skip building and decoding the per-stream mapping
+        return self._decode_entries(response[0][1], decode_fields)
+    
+    async def get_stream_batch(
+        self,
+        stream_name: str,
+        last_id: str = "0",
+        min_count: int = 1,
+        max_count: int = 256,
+        max_wait_ms: int = 100,
+        decode_fields: bool = True
+    ) -> List[Tuple[str, Dict[Any, Any]]]:
+        """
+        Read a batch of at least min_count and at most max_count messages.
+        
+        Keeps issuing blocking XREADs after the last ID seen until min_count
+        messages have arrived or max_wait_ms has passed, then returns what
+        was collected, which may be fewer than min_count. At least one read
+        is always made; once no time is left it no longer blocks.
+        """
+        if not 1 <= min_count <= max_count:
+            raise ValueError(f"Expected 1 <= min_count <= max_count, got min_count={min_count}, max_count={max_count}")
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait_ms / 1000
+        batch = []
+        
+        while True:
+            remaining_ms = int((deadline - loop.time()) * 1000)
+            
+            # BLOCK 0 would wait forever, so read without blocking instead
+            messages = await self.get_stream_messages(
+                stream_name,
+                last_id=last_id,
+                count=max_count - len(batch),
+                block_ms=remaining_ms if remaining_ms > 0 else None,
+                decode_fields=decode_fields
+            )
+            if messages:
+                batch.extend(messages)
+                last_id = messages[-1][0]
+            
+            if len(batch) >= min_count or remaining_ms <= 0:
+                return batch
+    
+    async def get_many_streams(
+        self,
+        streams: Dict[str, str],
+        count: int = 10,
+        block_ms: Optional[int] = None,
+        decode_fields: bool = True
+    ) -> Dict[str, List[Tuple[str, Dict[Any, Any]]]]:
+        """
+        Read messages from several streams in one XREAD call.
+        
+        streams maps each stream name to the ID to read after. Returns the
+        messages keyed by stream name; streams with nothing new are omitted.
+        """
+        response = await self.client.xread(streams, count=count, block=block_ms)
+        
+        return {
+            stream_name.decode(): self._decode_entries(entries, decode_fields)
+            for stream_name, entries in response or []
+        }
+    
+    @staticmethod
+    def _decode_entries(
+        entries: List[Tuple[bytes, Optional[Dict[bytes, bytes]]]],
+        decode_fields: bool = True
+    ) -> List[Tuple[str, Dict[Any, Any]]]:
+        """Decode raw stream entries to string IDs and field dicts."""
+        # Pending entries already trimmed from the stream come back without fields
+        if not decode_fields:
+            return [(message_id.decode(), fields or {}) for message_id, fields in entries]
+        
+        # Stream entries are field/value pairs, not JSON, so decode them here
+        return [
+            (message_id.decode(), {key.decode(): value.decode() for key, value in (fields or {}).items()})
+            for message_id, fields in entries
+        ]
+    
+    async def acknowledge_message(self, stream_name: str, group_name: str, message_id: str):
+        """
+        Acknowledge that a stream message has been processed.
+        
+        The acknowledgement is queued and sent by the background acker along
+        with any others queued around the same time, so this never waits on
+        Redis. Until connect() has started the acker it is sent directly.
+        """
+        if self._ack_task is None:
+            await self.acknowledge_messages(stream_name, group_name, [message_id])
+            return
+        
+        self._ack_queue.put_nowait((stream_name, group_name, message_id))
+    
+    async def acknowledge_messages(self, stream_name: str, group_name: str, message_ids: List[str]):
+        """Acknowledge a batch of processed stream messages in one round trip."""
+        if not message_ids:
+            return
+        
+        # XACK takes any number of IDs, so the whole batch is a single command
+        await self.client.xack(stream_name, group_name, *message_ids)
+    
+    async def _ack_loop(self):
+        """Send queued acknowledgements in batches, one XACK per stream and group."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            # Wait for the first acknowledgement, then collect whatever else
+            # arrives within the flush interval, up to the batch size
+            batch = [await self._ack_queue.get()]
+            deadline = loop.time() + self.ack_flush_interval_ms / 1000
+            
+            while len(batch) < self.ack_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._ack_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            pending: Dict[Tuple[str, str], List[str]] = {}
+            for stream_name, group_name, message_id in batch:
+                pending.setdefault((stream_name, group_name), []).append(message_id)
+            
+            try:
+                for (stream_name, group_name), message_ids in pending.items():
+                    self._ack_pipe.xack(stream_name, group_name, *message_ids)
+                await self._ack_pipe.execute()
+            except Exception as e:
+                # Unacknowledged messages stay pending and are delivered again
+                logger.error(f"Failed to acknowledge stream messages: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._ack_queue.task_done()
 
-# Create a singleton instance
-redis_client = RedisClient(str(settings.REDIS_URL))
\ No newline at end of file
+@functools.lru_cache(maxsize=1)
+def get_redis_client() -> RedisClient:
+    """Get the shared Redis client, creating it on first use."""
+    return RedisClient(
+        str(settings.REDIS_URL),
+        settings.REDIS_MAX_CONNECTIONS,
+        settings.REDIS_ACK_BATCH_SIZE,
+        settings.REDIS_ACK_FLUSH_INTERVAL_MS
+    )
\ No newline at end of file
@@ -0,0 +1,49 @@
+# notification-service/app/services/template_renderer.py
+import logging
+from typing import Any, Dict
+
+from jinja2 import DictLoader, Environment, select_autoescape
+
+logger = logging.getLogger(__name__)
+
+# Email templates, keyed by template name
+TEMPLATES: Dict[str, str] = {
+    "low_stock.html": """
+            <h2>🚨 Low Stock Alert</h2>
+            <p>Product <strong>{{ product_name }}</strong> is running low on stock and needs immediate attention.</p>
+
+            <div style="background-color: #f8f9fa; padding: 15px; border-left: 4px solid #dc3545; margin: 15px 0;">
+                <h3>Stock Details:</h3>
+                <ul style="margin: 0; padding-left: 20px;">
+                    <li><strong>Product ID:</strong> {{ product_id }}</li>
+                    <li><strong>Product Name:</strong> {{ product_name }}</li>
+                    <li><strong>Current Quantity:</strong> <span style="color: #dc3545; font-weight: bold;">{{ current_quantity }}</span></li>
+                    <li><strong>Reorder Threshold:</strong> {{ threshold }}</li>
+                    <li><strong>Stock Status:</strong> <span style="color: #dc3545;">Below Threshold</span></li>
+                </ul>
+            </div>
+
+            <p><strong>Action Required:</strong> Please replenish the inventory as soon as possible to avoid stockouts.</p>
+            """,
+}
+
+
+class TemplateRenderer:
+    """Renderer for notification templates."""
+
+    def __init__(self, templates: Dict[str, str]):
+        # The environment compiles each template once and caches it,
+        # so rendering after the first use skips parsing entirely
+        self.env = Environment(
+            loader=DictLoader(templates),
+            autoescape=select_autoescape(["html"]),
+        )
+
+    def render(self, template_name: str, **context: Any) -> str:
+        """
+        Render a template by name with the given context.
+        """
+        return self.env.get_template(template_name).render(**context)
+
+# Create a singleton instance
+template_renderer = TemplateRenderer(TEMPLATES)
@@ -0,0 +1,120 @@
+# notification-service/tests/test_notification_processor.py
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models.notification import Notification, NotificationStatus
+
+
+async def deliver(processor, redis_client, count):
+    """Publish count low stock messages and read them as the processor's consumer."""
+    await redis_client.create_consumer_group(processor.stream, processor.group)
+    for i in range(count):
+        await redis_client.client.xadd(processor.stream, {
+            "type": "low_stock",
+            "product_id": f"product-{i}",
+            "product_name": f"Product {i}",
+            "current_quantity": "2",
+            "threshold": "5",
+        })
+
+    return await redis_client.read_group(processor.stream, processor.group, processor.consumer, count=count, block_ms=10)
+
+
+def build_rows(processor, messages):
+    """Build the rows handle_notification would queue for the batch writer."""
+    rows = []
+    for message_id, data in messages:
+        row = processor.build_low_stock_notification(data)
+        row["source_message_id"] = message_id
+        rows.append(row)
+    return rows
+
+
+async def stored(db):
+    """All stored notifications, keyed by source message ID."""
+    result = await db.scalars(select(Notification).execution_options(populate_existing=True))
+    return {notification.source_message_id: notification for notification in result}
+
+
+async def pending_count(processor, redis_client):
+    """Number of stream messages delivered to the processor but not acknowledged."""
+    return (await redis_client.client.xpending(processor.stream, processor.group))["pending"]
+
+
+async def test_save_notifications_stores_claims_and_acknowledges_new_rows(processor, redis_client, db):
+    messages = await deliver(processor, redis_client, 2)
+    rows = build_rows(processor, messages)
+
+    # A message read twice in one batch is still stored and sent once
+    await processor.save_notifications(rows + rows[:1])
+
+    notifications = await stored(db)
+    assert set(notifications) == {message_id for message_id, _ in messages}
+    assert {n.status for n in notifications.values()} == {NotificationStatus.SENDING}
+    assert sorted(n.source_message_id for n in processor.dispatched) == sorted(notifications)
+    assert await pending_count(processor, redis_client) == 0
+
+
+@pytest.mark.parametrize("status", [NotificationStatus.SENDING, NotificationStatus.SENT, NotificationStatus.FAILED])
+async def test_save_notifications_skips_redelivered_rows_already_claimed(processor, redis_client, db, status):
+    messages = await deliver(processor, redis_client, 1)
+    rows = build_rows(processor, messages)
+    await processor.save_notifications(rows)
+    [notification] = (await stored(db)).values()
+    notification.status = status
+    await db.commit()
+    processor.dispatched.clear()
+
+    # Redelivered, e.g. because the acknowledgement was lost
+    await processor.save_notifications(build_rows(processor, messages))
+
+    notifications = await stored(db)
+    assert len(notifications) == 1
+    assert notifications[messages[0][0]].status == status
+    assert processor.dispatched == []
+    assert await pending_count(processor, redis_client) == 0
+
+
+async def test_save_notifications_sends_redelivered_rows_still_pending(processor, redis_client, db):
+    messages = await deliver(processor, redis_client, 1)
+    rows = build_rows(processor, messages)
+    db.add(Notification(**rows[0]))
+    await db.commit()
+
+    await processor.save_notifications(build_rows(processor, messages))
+
+    notifications = await stored(db)
+    assert len(notifications) == 1
+    assert notifications[messages[0][0]].status == NotificationStatus.SENDING
+    assert [n.source_message_id for n in processor.dispatched] == [messages[0][0]]
+
+
+async def test_claim_unfinished_notifications_claims_only_stale_rows(processor, redis_client, db):
+    messages = await deliver(processor, redis_client, 5)
+    rows = build_rows(processor, messages)
+    stale = func.now() - timedelta(seconds=settings.NOTIFICATION_SEND_TIMEOUT + 60)
+
+    statuses = [
+        (NotificationStatus.PENDING, stale),
+        (NotificationStatus.SENDING, stale),
+        (NotificationStatus.SENDING, stale),  # still being sent by this process
+        (NotificationStatus.SENDING, func.now()),
+        (NotificationStatus.SENT, stale),
+    ]
+    for row, (status, updated_at) in zip(rows, statuses):
+        db.add(Notification(**{**row, "status": status, "updated_at": updated_at}))
+    await db.commit()
+
+    notifications = await stored(db)
+    processor._sending_ids.add(notifications[messages[2][0]].id)
+
+    claimed = await processor.claim_unfinished_notifications()
+
+    assert sorted(n.source_message_id for n in claimed) == [messages[0][0], messages[1][0]]
+    assert {n.status for n in claimed} == {NotificationStatus.SENDING}
+
+    # The claim restarts the send timeout, so the rows are not claimed again
+    assert await processor.claim_unfinished_notifications() == []
@@ -0,0 +1,139 @@
+# notification-service/tests/test_redis_client.py
+import asyncio
+
+import pytest
+
+STREAM = "test:stream"
+GROUP = "test-group"
+
+
+async def add_messages(redis_client, count):
+    """Add count messages to the test stream and return their IDs."""
+    return [
+        (await redis_client.client.xadd(STREAM, {"n": str(i)})).decode()
+        for i in range(count)
+    ]
+
+
+async def pending_count(redis_client):
+    """Number of messages delivered to the test group but not acknowledged."""
+    return (await redis_client.client.xpending(STREAM, GROUP))["pending"]
+
+
+async def test_get_stream_batch_without_wait_returns_available_messages(redis_client):
+    ids = await add_messages(redis_client, 5)
+
+    batch = await redis_client.get_stream_batch(STREAM, min_count=10, max_count=20, max_wait_ms=0)
+
+    assert [message_id for message_id, _ in batch] == ids
+    assert batch[0][1] == {"n": "0"}
+
+
+async def test_get_stream_batch_respects_max_count(redis_client):
+    ids = await add_messages(redis_client, 5)
+
+    batch = await redis_client.get_stream_batch(STREAM, min_count=2, max_count=2)
+
+    assert [message_id for message_id, _ in batch] == ids[:2]
+
+
+async def test_get_stream_batch_returns_partial_batch_after_max_wait(redis_client):
+    await add_messages(redis_client, 3)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    batch = await redis_client.get_stream_batch(STREAM, min_count=10, max_count=20, max_wait_ms=200)
+
+    assert len(batch) == 3
+    assert loop.time() - started < 1
+
+
+async def test_get_stream_batch_collects_messages_arriving_while_waiting(redis_client):
+    first = await add_messages(redis_client, 1)
+
+    async def add_later():
+        await asyncio.sleep(0.05)
+        return await add_messages(redis_client, 1)
+
+    later = asyncio.create_task(add_later())
+    batch = await redis_client.get_stream_batch(STREAM, min_count=2, max_count=10, max_wait_ms=1000)
+
+    assert [message_id for message_id, _ in batch] == first + await later
+
+
+@pytest.mark.parametrize("min_count, max_count", [(0, 10), (5, 2)])
+async def test_get_stream_batch_rejects_invalid_counts(redis_client, min_count, max_count):
+    with pytest.raises(ValueError):
+        await redis_client.get_stream_batch(STREAM, min_count=min_count, max_count=max_count)
+
+
+async def test_claim_pending_takes_over_idle_messages(redis_client):
+    await redis_client.create_consumer_group(STREAM, GROUP)
+    ids = await add_messages(redis_client, 3)
+    await redis_client.read_group(STREAM, GROUP, "gone", count=10, block_ms=10)
+
+    # Not idle long enough yet
+    next_id, claimed = await redis_client.claim_pending(STREAM, GROUP, "live", min_idle_ms=60000)
+    assert claimed == []
+
+    await asyncio.sleep(0.05)
+    next_id, claimed = await redis_client.claim_pending(STREAM, GROUP, "live", min_idle_ms=10)
+
+    assert next_id == "0-0"
+    assert [message_id for message_id, _ in claimed] == ids
+    assert claimed[0][1] == {"n": "0"}
+
+    consumers = await redis_client.client.xinfo_consumers(STREAM, GROUP)
+    assert {consumer["name"]: consumer["pending"] for consumer in consumers}[b"live"] == 3
+
+
+async def test_claim_pending_resumes_from_returned_id(redis_client):
+    await redis_client.create_consumer_group(STREAM, GROUP)
+    ids = await add_messages(redis_client, 3)
+    await redis_client.read_group(STREAM, GROUP, "gone", count=10, block_ms=10)
+    await asyncio.sleep(0.05)
+
+    next_id, claimed = await redis_client.claim_pending(STREAM, GROUP, "live", min_idle_ms=10, count=2)
+    assert [message_id for message_id, _ in claimed] == ids[:2]
+    assert next_id == ids[2]
+
+    next_id, claimed = await redis_client.claim_pending(STREAM, GROUP, "live", min_idle_ms=10, start_id=next_id)
+    assert [message_id for message_id, _ in claimed] == ids[2:]
+    assert next_id == "0-0"
+
+
+async def test_acknowledge_message_is_sent_by_background_acker(redis_client):
+    await redis_client.connect()
+    await redis_client.create_consumer_group(STREAM, GROUP)
+    await add_messages(redis_client, 3)
+    messages = await redis_client.read_group(STREAM, GROUP, "consumer", count=10, block_ms=10)
+    assert await pending_count(redis_client) == 3
+
+    for message_id, _ in messages:
+        await redis_client.acknowledge_message(STREAM, GROUP, message_id)
+    await redis_client._ack_queue.join()
+
+    assert await pending_count(redis_client) == 0
+
+
+async def test_close_flushes_queued_acknowledgements(redis_client):
+    await redis_client.connect()
+    await redis_client.create_consumer_group(STREAM, GROUP)
+    await add_messages(redis_client, 2)
+    messages = await redis_client.read_group(STREAM, GROUP, "consumer", count=10, block_ms=10)
+
+    for message_id, _ in messages:
+        await redis_client.acknowledge_message(STREAM, GROUP, message_id)
+    await redis_client.close()
+
+    assert await pending_count(redis_client) == 0
+
+
+async def test_acknowledge_message_is_sent_directly_before_connect(redis_client):
+    await redis_client.create_consumer_group(STREAM, GROUP)
+    await add_messages(redis_client, 1)
+    [(message_id, _)] = await redis_client.read_group(STREAM, GROUP, "consumer", count=10, block_ms=10)
+
+    await redis_client.acknowledge_message(STREAM, GROUP, message_id)
+
+    assert await pending_count(redis_client) == 0